@@ -1,15 +1,22 @@
 import requests
-from bs4 import BeautifulSoup
+import resilience
 
 Info = {
     "Description":"Get News About English Premier League"
 }
 def execute(message=None):
+    from bs4 import BeautifulSoup  # Imported lazily to keep cold start fast
+
     # Define the URL to scrape for EPL news from Sky Sports
     url = "https://www.skysports.com/premier-league-news"
 
     # Send HTTP request to the URL
-    response = requests.get(url)
+    try:
+        response = resilience.request("skysports", "get", url, hedge=True)
+    except resilience.CircuitOpenError:
+        return resilience.FALLBACK_MESSAGE
+    except requests.RequestException:
+        return "⚠️ Unable to access the Sky Sports website at the moment. Please try again later."
 
     # Check if the page is accessible
     if response.status_code != 200:
@@ -38,9 +45,12 @@ def execute(message=None):
 
     # Fetch live matches if available
     live_matches_url = "https://www.skysports.com/live-scores/football"
-    live_response = requests.get(live_matches_url)
-    
-    if live_response.status_code == 200:
+    try:
+        live_response = resilience.request("skysports", "get", live_matches_url, hedge=True)
+    except (resilience.CircuitOpenError, requests.RequestException):
+        live_response = None
+
+    if live_response is not None and live_response.status_code == 200:
         live_soup = BeautifulSoup(live_response.text, 'html.parser')
         live_matches = live_soup.find_all('div', class_='fixres__item')
 
@@ -1,35 +1,51 @@
-import requests
-from io import BytesIO
+import resilience
 
 Info = {
     "Description": "Generate an image based on the given prompt using the custom API."
 }
 
-def execute(message):
+API_URL = "https://smfahim.xyz/prodia"
+AWAITING_MESSAGE = "🎨 Kora is generating Your Image..."
+
+def normalize_prompt(prompt):
+    """Normalize a prompt so equivalent requests share one cached image."""
+    return " ".join(prompt.lower().split())
+
+def generate_image(prompt):
     """
-    Generate an image based on the given prompt using the custom API.
+    Generate an image for the prompt using the custom API.
 
     Args:
-        message (str): The user's prompt to generate an image.
+        prompt (str): The user's prompt to generate an image.
 
     Returns:
-        dict: Contains success status and image data or error message.
+        tuple: The image bytes and their MIME type.
     """
-    try:
-        # Custom API endpoint
-        api_url = f"https://smfahim.xyz/prodia?prompt={message}&model=1&num_images=1"
+    response = resilience.request("smfahim", "get", API_URL, params={"prompt": prompt, "model": 1, "num_images": 1})
+    response.raise_for_status()
+    mime_type = response.headers.get("Content-Type", "image/jpeg").split(";")[0]
+    return response.content, mime_type
 
-        # Sending the prompt to the API
-        response = requests.get(api_url)
+def execute(message):
+    """
+    Queue an image generation job for the given prompt.
 
-        if response.status_code == 200:
-            # Get the image as bytes
-            image_data = BytesIO(response.content)
-            awaiting="🎨 Kora is generating Your Image..."
-            return {"awaiting":awaiting,"success": True, "data": image_data}
+    The image is generated in the background by the webhook worker pool, so
+    this only validates the prompt and describes the job.
 
-        else:
-            return {"success": False, "data": "🚨 Failed to generate the image. Please try again later."}
+    Args:
+        message (str): The user's prompt to generate an image.
 
-    except Exception as e:
-        return {"success": False, "data": f"🚨 An error occurred: {str(e)}"}
+    Returns:
+        dict: Contains success status, the awaiting message and the job details.
+    """
+    if not message or not message.strip():
+        return {"success": False, "data": "🚨 Please provide a prompt. Example: /gen a cat in space"}
+
+    return {
+        "success": True,
+        "awaiting": AWAITING_MESSAGE,
+        "job": "image",
+        "prompt": normalize_prompt(message),
+        "generate": lambda: generate_image(message),
+    }
@@ -4,6 +4,7 @@ import re
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import logging
+import resilience
 
 # Command Info
 Info = {
@@ -18,6 +19,22 @@ def is_valid_email(email):
     regex = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
     return re.match(regex, email)
 
+def is_connection_failure(error):
+    """Only connection problems and timeouts count against the SMTP breaker, not bad input."""
+    if isinstance(error, (smtplib.SMTPConnectError, smtplib.SMTPServerDisconnected)):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+def send_email(server_host, port, username, password, recipient_email, msg):
+    """Connect to the SMTP server and send the email."""
+    server = smtplib.SMTP(server_host, port, timeout=resilience.timeout_for("smtp")[1])
+    try:
+        server.starttls()  # Upgrade the connection to a secure encrypted SSL/TLS connection
+        server.login(username, password)
+        server.sendmail(username, recipient_email, msg.as_string())
+    finally:
+        server.quit()
+
 def execute(message=None):
     """
     Send an email using SMTP based on the provided message.
@@ -61,14 +78,13 @@ def execute(message=None):
         msg.attach(MIMEText(body, "plain"))
 
         # Connect to the SMTP server and send the email
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()  # Upgrade the connection to a secure encrypted SSL/TLS connection
-        server.login(SMTP_USERNAME, SMTP_PASSWORD)
-        server.sendmail(SMTP_USERNAME, recipient_email, msg.as_string())
-        server.quit()
+        resilience.call("smtp", send_email, SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, recipient_email, msg,
+                        is_failure=is_connection_failure)
 
         return {"success": True, "data": f"✅ Email sent successfully to {recipient_email}!"}
 
+    except resilience.CircuitOpenError:
+        return {"success": False, "data": resilience.FALLBACK_MESSAGE}
     except smtplib.SMTPAuthenticationError:
         logging.error("Authentication failed. Please check your email and password.")
         return {"success": False, "data": "🚨 Authentication failed. Please check your credentials."}
@@ -1,4 +1,4 @@
-import requests as Sman
+import resilience
 
 Info = {
     "Description": "Get the latest news headlines from around the world."
@@ -14,7 +14,7 @@ def execute(message=None):
     # Default country
     country =  'us'
     try:
-        response = Sman.get(f"{SMAN_NEWS_URL}?country={country}&apiKey={SMAN_API_KEY}")
+        response = resilience.request("newsapi", "get", f"{SMAN_NEWS_URL}?country={country}&apiKey={SMAN_API_KEY}", hedge=True)
         data = response.json()
         
         # Check API status
@@ -35,5 +35,7 @@ def execute(message=None):
         output.append("╰───────────────────────────────╯")
         
         return "\n".join(output)
+    except resilience.CircuitOpenError:
+        return resilience.FALLBACK_MESSAGE
     except Exception as e:
         return f"⚠️ Error fetching news data: {e}"
@@ -1,14 +1,21 @@
 import requests
-from bs4 import BeautifulSoup
+import resilience
 import random
 Info = {
     "Description":"Get Random quotes to Motivate you"
 }
 
 def execute():
+    from bs4 import BeautifulSoup  # Imported lazily to keep cold start fast
+
     # Scrape quotes from the website
     url = "http://quotes.toscrape.com/"
-    response = requests.get(url)
+    try:
+        response = resilience.request("quotes", "get", url, hedge=True)
+    except resilience.CircuitOpenError:
+        return resilience.FALLBACK_MESSAGE
+    except requests.RequestException:
+        return "⚠️ Unable to access the quotes website at the moment. Please try again later."
     
     # Check if the page is accessible
     if response.status_code != 200:
@@ -1,5 +1,5 @@
-import app  # Import the main app to access `get_bot_uptime`
-import time
+import shutil
+import metrics  # Shared runtime stats; importing `app` here would re-run its setup
 
 # Description dictionary
 Info = {
@@ -18,12 +18,28 @@ def format_duration(seconds):
     minutes, seconds = divmod(seconds, 60)
     return f"{int(days)}d {int(hours)}h {int(minutes)}m {int(seconds)}s"
 
+def format_bytes(size):
+    # Helper function to format a byte count as KB/MB/GB
+    if size is None:
+        return "N/A"
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f}{unit}" if unit != "B" else f"{size}B"
+        size /= 1024
+
+def format_ms(value):
+    return "N/A" if value is None else f"{value:.0f}ms"
+
 def execute(message=None):
-    # Get the bot's uptime in seconds
-    uptime_seconds = app.get_bot_uptime()
+    stats = metrics.snapshot()
 
     # Format uptime for better readability
-    uptime_str = format_duration(uptime_seconds)
+    uptime_str = format_duration(stats["uptime_seconds"])
+
+    outbox = stats.get("outbox") or {}
+    jobs = stats.get("jobs") or {}
+    cache_hit_rates = stats.get("cache_hit_rates") or {}
+    disk = shutil.disk_usage(".")
 
     # Visual and structured response
     response = (
@@ -38,12 +54,19 @@ def execute(message=None):
         "⏳ **Uptime:**\n"
         f"   └─ {uptime_str}\n\n"
         "📊 **System Overview:**\n"
-        f"   • **CPU Usage:** {get_cpu_usage()}%\n"
-        f"   • **Memory Usage:** {get_memory_usage()}%\n\n"
+        f"   • **CPU Usage:** {stats['cpu_percent']}%\n"
+        f"   • **Memory Usage:** {format_bytes(stats['rss_bytes'])} ({stats['memory_percent'] or 'N/A'}%)\n\n"
+        "📨 **Traffic:**\n"
+        f"   • Messages/min: {stats['messages_per_minute']}\n"
+        f"   • Reply latency: p50 {format_ms(stats['latency']['p50_ms'])} / p99 {format_ms(stats['latency']['p99_ms'])}\n"
+        f"   • Outbox: {outbox.get('pending', 0)} pending, {outbox.get('lag_seconds', 0)}s lag\n"
+        f"   • Image jobs: {jobs.get('queued', 0)} queued, {jobs.get('running', 0)} running\n"
+        f"   • Cache hit rate: images {cache_hit_rates.get('media', 0):.0%}, quick replies {cache_hit_rates.get('fastpath', 0):.0%}\n\n"
         "📁 **Storage:**\n"
-        "   • Total: 3.0GB"
-        "   • Used: 1.6GB\n"
-        "   • Free: 1.4GB\n\n"
+        f"   • Total: {format_bytes(disk.total)}\n"
+        f"   • Used: {format_bytes(disk.used)}\n"
+        f"   • Free: {format_bytes(disk.free)}\n"
+        f"   • Database: {format_bytes(stats['file_sizes'].get('database'))}\n\n"
         "━━━━━━━━━━━━━━━━━\n"
         "💡 **Additional Information:**\n"
         "   • This bot is designed to assist and engage in an interactive manner.\n"
@@ -51,11 +74,3 @@ def execute(message=None):
     )
 
     return response
-
-def get_cpu_usage():
-    # Placeholder: Add real CPU usage code if required
-    return "N/A"
-
-def get_memory_usage():
-    # Placeholder: Add real memory usage code if required
-    return "N/A"
@@ -5,9 +5,19 @@ from dotenv import load_dotenv
 from flask_cors import CORS
 import requests
 import messageHandler  # Import your message handler module
+import resilience
+import outbox
+import logconfig
+import metrics
+import contextvars
+import uuid
+import hmac
 import time
+import threading
 import sqlite3
 from datetime import datetime, timedelta
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 
 # Load environment variables
 load_dotenv()
@@ -15,14 +25,24 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging: records are written by a background thread, never on the request path
+logconfig.setup_logging()
 logger = logging.getLogger()
 
 WHATSAPP_API_TOKEN = os.getenv("WHATSAPP_API_TOKEN")
 PHONE_NUMBER_ID = os.getenv("PHONE_NUMBER_ID")
 VERIFY_TOKEN = os.getenv("VERIFY_TOKEN")
 PREFIX = os.getenv("PREFIX", "/")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PREWARM_IMPORTS = os.getenv("PREWARM_IMPORTS", "1") == "1"
+GRAPH_API_URL = "https://graph.facebook.com/v21.0"
+
+# Background workers for slow jobs such as image generation
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+
+# WhatsApp media IDs expire after 30 days, so cached ones are reused for less
+MEDIA_CACHE_TTL = timedelta(days=29)
 
 # SQLite Database Initialization
 DB_PATH = "messages.db"
@@ -39,6 +59,14 @@ def init_db():
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS generated_images (
+                prompt TEXT PRIMARY KEY,
+                media_id TEXT,
+                mime_type TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
         conn.commit()
 
 init_db()
@@ -70,58 +98,185 @@ def cleanup_old_messages():
         cursor.execute("DELETE FROM messages WHERE timestamp < ?", (cutoff_time,))
         conn.commit()
 
+def get_cached_media(prompt):
+    """Return the cached media ID for a normalized prompt, if still valid."""
+    cutoff_time = datetime.now() - MEDIA_CACHE_TTL
+    with sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT media_id FROM generated_images
+            WHERE prompt = ? AND timestamp >= ?
+        """, (prompt, cutoff_time))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+def cache_media(prompt, media_id, mime_type):
+    """Store the media ID generated for a normalized prompt."""
+    with sqlite3.connect(DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO generated_images (prompt, media_id, mime_type, timestamp)
+            VALUES (?, ?, ?, ?)
+        """, (prompt, media_id, mime_type, datetime.now()))
+        conn.commit()
+
 # Function to split long messages into chunks
 def split_message(message, limit=4096):
     """Split a message into chunks within the WhatsApp character limit."""
     return [message[i:i+limit] for i in range(0, len(message), limit)]
 
-# Function to send WhatsApp messages
-def send_whatsapp_message(recipient_id, message):
-    url = f"https://graph.facebook.com/v16.0/{PHONE_NUMBER_ID}/messages"
+# Deliver one queued payload to the Graph API; called by the outbox sender loop
+def deliver_message(payload):
+    """Send a payload and return (ok, retryable, error); raises outbox.Deferred while the breaker is open."""
+    url = f"{GRAPH_API_URL}/{PHONE_NUMBER_ID}/messages"
     headers = {
         "Authorization": f"Bearer {WHATSAPP_API_TOKEN}",
         "Content-Type": "application/json",
     }
 
+    try:
+        response = resilience.request("graph", "post", url, headers=headers, json=payload)
+    except resilience.CircuitOpenError as e:
+        # Nothing was sent, so wait for the breaker instead of using up a retry
+        raise outbox.Deferred(e.retry_after, str(e))
+    except requests.RequestException as e:
+        logger.error("Failed to send message: %s", str(e))
+        return False, True, str(e)
+    if response.status_code == 200:
+        return True, False, None
+
+    logger.error("Failed to send message: %s", response.text)
+    # Throttling and server errors are retried; other client errors won't succeed later
+    retryable = response.status_code == 429 or response.status_code >= 500
+    return False, retryable, f"HTTP {response.status_code}: {response.text[:500]}"
+
+# Function to send WhatsApp messages
+def send_whatsapp_message(recipient_id, message):
+    """Queue a reply for delivery; it is stored before it is sent."""
     if isinstance(message, dict):  # Media or structured message
-        payload = message
+        outbox.enqueue(recipient_id, message)
     else:  # Text message
         # Split long messages into chunks
         message_chunks = split_message(message)
         for chunk in message_chunks:
-            payload = {
+            outbox.enqueue(recipient_id, {
                 "messaging_product": "whatsapp",
                 "to": recipient_id,
                 "type": "text",
                 "text": {"body": chunk},
-            }
-            response = requests.post(url, headers=headers, json=payload)
-            if response.status_code != 200:
-                logger.error("Failed to send message: %s", response.json())
-                break
+            })
 
 # Handle attachments (image, audio, etc.)
 def send_media_message(recipient_id, media_type, media_url):
-    url = f"https://graph.facebook.com/v21.0/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_API_TOKEN}",
-        "Content-Type": "application/json",
-    }
-
-    payload = {
+    send_whatsapp_message(recipient_id, {
         "messaging_product": "whatsapp",
         "to": recipient_id,
         "type": media_type,
         media_type: {
             "link": media_url
         }
-    }
+    })
 
-    response = requests.post(url, headers=headers, json=payload)
-    if response.status_code == 200:
-        logger.info(f"{media_type.capitalize()} message sent successfully to {recipient_id}")
-    else:
-        logger.error("Failed to send media message: %s", response.json())
+# Upload media bytes once to WhatsApp and return the media ID
+def upload_media(data, mime_type):
+    url = f"{GRAPH_API_URL}/{PHONE_NUMBER_ID}/media"
+    headers = {"Authorization": f"Bearer {WHATSAPP_API_TOKEN}"}
+    extension = mime_type.split("/")[-1]
+    files = {"file": (f"upload.{extension}", data, mime_type)}
+    form = {"messaging_product": "whatsapp", "type": mime_type}
+
+    response = resilience.request("graph", "post", url, headers=headers, files=files, data=form)
+    response.raise_for_status()
+    return response.json()["id"]
+
+# Send previously uploaded media by its ID
+def send_media_by_id(recipient_id, media_type, media_id):
+    send_whatsapp_message(recipient_id, {
+        "messaging_product": "whatsapp",
+        "to": recipient_id,
+        "type": media_type,
+        media_type: {
+            "id": media_id
+        }
+    })
+
+# Outbound queue; the sender thread is started by the serving process (see start_outbox)
+outbox.init(DB_PATH)
+
+# Runtime stats read by /up and /admin/stats
+metrics.register_file("database", DB_PATH)
+metrics.register("outbox", outbox.stats)
+metrics.register("jobs", lambda: {
+    "queued": metrics.get_counter("jobs_submitted") - metrics.get_counter("jobs_started"),
+    "running": metrics.get_counter("jobs_started") - metrics.get_counter("jobs_finished"),
+})
+metrics.register("cache_hit_rates", lambda: {
+    "media": metrics.hit_rate("media_cache"),
+    "fastpath": messageHandler.fastpath.stats()["hit_rate"],
+})
+metrics.register("breakers", resilience.breaker_states)
+metrics.register("logging", lambda: {"dropped": logconfig.NonBlockingQueueHandler.dropped})
+
+# In-flight image jobs by normalized prompt, so identical prompts share one generation
+_image_jobs = {}
+_image_jobs_lock = threading.Lock()
+
+# Generate and upload an image in the background, returning its media ID
+def generate_image_media(job):
+    metrics.increment("jobs_started")
+    try:
+        media_id = get_cached_media(job["prompt"])
+        if not media_id:
+            image_data, mime_type = job["generate"]()
+            media_id = upload_media(image_data, mime_type)
+            cache_media(job["prompt"], media_id, mime_type)
+        return media_id
+    finally:
+        with _image_jobs_lock:
+            _image_jobs.pop(job["prompt"], None)
+        metrics.increment("jobs_finished")
+
+# Send a finished image job's result to one recipient
+def send_image_result(recipient_id, future):
+    try:
+        send_media_by_id(recipient_id, "image", future.result())
+    except resilience.CircuitOpenError as e:
+        logger.warning("Image job skipped: %s", str(e))
+        send_whatsapp_message(recipient_id, resilience.FALLBACK_MESSAGE)
+    except Exception as e:
+        # Exception text can include the request URL, which carries the user's prompt
+        status = getattr(getattr(e, "response", None), "status_code", None)
+        logger.error("Image job failed: %s (status %s)", type(e).__name__, status)
+        send_whatsapp_message(recipient_id, "🚨 Failed to generate the image. Please try again later.")
+
+# Queue an image job, or attach to the one already running for the same prompt
+def submit_image_job(recipient_id, job):
+    with _image_jobs_lock:
+        future = _image_jobs.get(job["prompt"])
+        if future is None:
+            metrics.increment("jobs_submitted")
+            future = job_executor.submit(contextvars.copy_context().run, generate_image_media, job)
+            _image_jobs[job["prompt"]] = future
+    context = contextvars.copy_context()
+    future.add_done_callback(lambda done: context.run(send_image_result, recipient_id, done))
+
+# Tag every log line for a request with a correlation ID
+@app.before_request
+def assign_request_id():
+    logconfig.request_id.set(request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12])
+
+# Load heavy dependencies in the background once the server is serving requests.
+# This runs in the process that handles traffic, not the debug reloader's parent.
+@app.before_request
+def start_prewarm():
+    if PREWARM_IMPORTS:
+        messageHandler.prewarm()
+
+# Start draining the outbound queue, including anything left from a previous run.
+# Like pre-warming, this runs in the serving process rather than on import.
+@app.before_request
+def start_outbox():
+    outbox.start(DB_PATH, deliver_message)
 
 # Webhook verification for WhatsApp
 @app.route('/webhook', methods=['GET'])
@@ -137,46 +292,111 @@ def verify():
 @app.route('/webhook', methods=['POST'])
 def webhook():
     data = request.get_json()
-    logger.info("Received data: %s", data)
+    if logconfig.sampled():
+        logger.info("Received data: %s", logconfig.redact(data))
 
     cleanup_old_messages()  # Clean up old messages on every new message
+    outbox.cleanup_failed()
 
     if data.get("object") == "whatsapp_business_account":
         for entry in data["entry"]:
             for change in entry["changes"]:
                 if "messages" in change["value"]:
                     for message in change["value"]["messages"]:
-                        recipient_id = message["from"]
-                        message_type = message.get("type")
-                        message_text = message.get("text", {}).get("body")
-                        message_command = message_text if message_text and message_text.startswith(PREFIX) else None
-
-                        # Save the message to the database
-                        if message_text:
-                            save_message(recipient_id, message_text)
-
-                        # Handle text commands
-                        if message_command:
-                            sliced_message = message_command[len(PREFIX):]
-                            command_name = sliced_message.split()[0]
-                            prompt = sliced_message[len(command_name):].strip()
-
-                            response = messageHandler.handle_text_command(command_name, prompt)
-                            send_whatsapp_message(recipient_id, response["data"] if response.get("success") else "⚠️ Error processing your command.")
-
-                        # Handle regular text messages
-                        elif message_type == "text":
-                            recent_messages = get_recent_messages(recipient_id)
-                            bot_response = messageHandler.handle_text_message(message_text, recent_messages)
-                            send_whatsapp_message(recipient_id, bot_response)
-
-                        # Handle media attachments
-                        elif message_type in ["image", "audio", "video", "document"]:
-                            media_url = message[message_type]["url"]
-                            response = messageHandler.handle_attachment(media_url, message_type,file_extension)
-                            send_whatsapp_message(recipient_id, response)
+                        started = time.monotonic()
+                        try:
+                            recipient_id = message["from"]
+                            message_type = message.get("type")
+                            message_text = message.get("text", {}).get("body")
+                            message_command = message_text if message_text and message_text.startswith(PREFIX) else None
+
+                            # Save the message to the database
+                            if message_text:
+                                save_message(recipient_id, message_text)
+
+                            # Handle text commands
+                            if message_command:
+                                sliced_message = message_command[len(PREFIX):]
+                                command_name = sliced_message.split()[0]
+                                prompt = sliced_message[len(command_name):].strip()
+
+                                response = messageHandler.handle_text_command(command_name, prompt)
+                                if not isinstance(response, dict):  # Commands may return plain text
+                                    response = {"success": True, "data": response}
+
+                                # Background jobs: serve cached results instantly, otherwise acknowledge and queue
+                                if response.get("success") and response.get("job") == "image":
+                                    media_id = get_cached_media(response["prompt"])
+                                    if media_id:
+                                        metrics.increment("media_cache_hit")
+                                        send_media_by_id(recipient_id, "image", media_id)
+                                    else:
+                                        metrics.increment("media_cache_miss")
+                                        send_whatsapp_message(recipient_id, response["awaiting"])
+                                        submit_image_job(recipient_id, response)
+                                else:
+                                    send_whatsapp_message(recipient_id, response.get("data") or "⚠️ Error processing your command.")
+
+                            # Handle regular text messages
+                            elif message_type == "text":
+                                recent_messages = get_recent_messages(recipient_id)
+                                bot_response = messageHandler.handle_text_message(message_text, recent_messages)
+                                send_whatsapp_message(recipient_id, bot_response)
+
+                            # Handle media attachments
+                            elif message_type in ["image", "audio", "video", "document"]:
+                                media_url = message[message_type]["url"]
+                                response = messageHandler.handle_attachment(media_url, message_type,file_extension)
+                                send_whatsapp_message(recipient_id, response)
+
+                        finally:
+                            metrics.record_message(time.monotonic() - started)
     return "EVENT_RECEIVED", 200
 
+# Monitoring endpoints require the X-Admin-Token header. They fail closed:
+# every one of them returns 403 unless ADMIN_TOKEN is configured.
+def admin_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = request.headers.get("X-Admin-Token", "")
+        if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({"error": "unauthorized"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+# Circuit breaker state and trip counts for monitoring
+@app.route('/status/breakers', methods=['GET'])
+@admin_required
+def breakers():
+    return jsonify(resilience.breaker_states())
+
+# Per-key Gemini usage for monitoring
+@app.route('/status/keys', methods=['GET'])
+@admin_required
+def keys():
+    return jsonify({
+        "text": messageHandler.TEXT_KEYS.usage(),
+        "image": messageHandler.IMAGE_KEYS.usage(),
+    })
+
+# Fast-path router hit rate for monitoring
+@app.route('/status/fastpath', methods=['GET'])
+@admin_required
+def fastpath_stats():
+    return jsonify(messageHandler.fastpath.stats())
+
+# Outbound queue depth, lag and retry counts for monitoring
+@app.route('/status/outbox', methods=['GET'])
+@admin_required
+def outbox_stats():
+    return jsonify(outbox.stats())
+
+# Live runtime stats (uptime, CPU, memory, throughput, latency, queues, caches)
+@app.route('/admin/stats', methods=['GET'])
+@admin_required
+def admin_stats():
+    return jsonify(metrics.snapshot())
+
 # Start the Flask app
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=3000)
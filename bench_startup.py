@@ -0,0 +1,63 @@
+"""Cold start benchmark.
+
+Imports `app` in a fresh interpreter with `-X importtime` and fails if the
+cumulative import time goes over the budget or a heavy dependency is loaded
+eagerly.
+
+Usage: python bench_startup.py [budget_ms]
+"""
+import os
+import subprocess
+import sys
+
+# Modules that must not be imported at startup (keep in sync with
+# messageHandler.HEAVY_MODULES; not imported here so the benchmark process
+# doesn't load .env, key pools or logging)
+HEAVY_MODULES = ("google.generativeai", "PyPDF2", "docx", "bs4")
+
+# Budget for `import app` in milliseconds (override with STARTUP_BUDGET_MS)
+DEFAULT_BUDGET_MS = 1500
+
+
+def measure_imports(module="app"):
+    """Return a dict of module name -> cumulative import time in microseconds."""
+    env = dict(os.environ, PREWARM_IMPORTS="0")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else float(os.getenv("STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS))
+    timings = measure_imports()
+    total_ms = timings.get("app", 0) / 1000
+    print(f"import app: {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+
+    slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[:10]
+    for name, cumulative in slowest:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    eager = [name for name in HEAVY_MODULES if name in timings]
+    if eager:
+        print(f"FAIL: heavy dependencies imported at startup: {', '.join(eager)}")
+        failed = True
+    if total_ms > budget_ms:
+        print("FAIL: cold start is over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
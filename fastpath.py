@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import time
+import random
+import logging
+import threading
+import unicodedata
+from collections import Counter
+
+logger = logging.getLogger()
+
+# Rules live in a JSON file so intents, keywords and replies can be tuned
+# without code changes. The file is re-read when it changes on disk.
+RULES_PATH = os.getenv("FASTPATH_RULES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fastpath_rules.json"))
+RELOAD_INTERVAL = 5
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_HAS_WORD = re.compile(r"\w")
+_QUESTION = re.compile(r"\?")
+
+_lock = threading.Lock()
+_rules = None
+_rules_mtime = None
+_last_checked = 0.0
+_stats = Counter()
+
+def _compile(raw):
+    """Precompile patterns and keyword sets for a rules dict."""
+    intents = []
+    for name, intent in raw.get("intents", {}).items():
+        intents.append({
+            "name": name,
+            "patterns": [re.compile(pattern) for pattern in intent.get("patterns", [])],
+            "anchors": frozenset(intent.get("anchors", [])),
+            "keywords": frozenset(intent.get("keywords", [])),
+            "emoji_only": intent.get("emoji_only", False),
+            "replies": intent.get("replies", []),
+        })
+    return {
+        "enabled": raw.get("enabled", True),
+        "max_words": raw.get("max_words", 6),
+        "filler_words": frozenset(raw.get("filler_words", [])),
+        "intents": intents,
+    }
+
+def load_rules(path=RULES_PATH):
+    """Load and compile rules from disk.
+
+    A failed reload keeps the last good rules; the router is only disabled if
+    the first load fails. Either way the file isn't retried until it changes.
+    """
+    global _rules, _rules_mtime
+    mtime = None
+    try:
+        mtime = os.path.getmtime(path)
+        with open(path, encoding="utf-8") as f:
+            rules = _compile(json.load(f))
+    except (OSError, ValueError, re.error) as e:
+        if _rules is not None and _rules["enabled"]:
+            logger.warning("Fast-path rules reload failed (%s), keeping the previous rules.", e)
+            rules = _rules
+        else:
+            logger.warning("Fast-path rules unavailable (%s), routing everything to the LLM.", e)
+            rules = _compile({"enabled": False})
+    with _lock:
+        _rules, _rules_mtime = rules, mtime
+    return rules
+
+def _current_rules():
+    global _last_checked
+    now = time.monotonic()
+    if _rules is None:
+        return load_rules()
+    if now - _last_checked >= RELOAD_INTERVAL:
+        _last_checked = now
+        try:
+            if os.path.getmtime(RULES_PATH) != _rules_mtime:
+                return load_rules()
+        except OSError:
+            pass
+    return _rules
+
+def _is_punctuation_only(text):
+    return all(unicodedata.category(char).startswith(("P", "Z")) or char.isspace() for char in text)
+
+def _is_emoji_only(text):
+    """Return True if text has at least one emoji (So) and otherwise only emoji
+    modifiers, joiners, punctuation or spaces, so "+", "$" or "=" don't count."""
+    categories = [unicodedata.category(char) for char in text if not char.isspace()]
+    return "So" in categories and all(
+        category in ("So", "Sk", "Mn", "Cf") or category.startswith(("P", "Z")) for category in categories
+    )
+
+def classify(message):
+    """Return the trivial intent a message matches, or None if it needs the LLM."""
+    rules = _current_rules()
+    if not rules["enabled"] or not message:
+        return None
+
+    text = message.strip().lower()
+    if _QUESTION.search(text):
+        return None
+
+    if _is_punctuation_only(text):
+        return None
+
+    if not _HAS_WORD.search(text):
+        if not _is_emoji_only(text):
+            return None
+        for intent in rules["intents"]:
+            if intent["emoji_only"]:
+                return intent
+        return None
+
+    words = _PUNCTUATION.sub(" ", text).split()
+    if not words or len(words) > rules["max_words"]:
+        return None
+
+    normalized = " ".join(words)
+    for intent in rules["intents"]:
+        if any(pattern.match(normalized) for pattern in intent["patterns"]):
+            return intent
+
+    # Bag-of-words classifier: every word must be one of the intent's anchors,
+    # supporting keywords or filler, at least one word must be an anchor, and
+    # the intent with the most anchor hits wins. Supporting keywords such as
+    # "good" or "it" never classify a message on their own.
+    best, best_hits = None, 0
+    for intent in rules["intents"]:
+        hits = sum(1 for word in words if word in intent["anchors"])
+        if hits > best_hits and all(
+            word in intent["anchors"] or word in intent["keywords"] or word in rules["filler_words"]
+            for word in words
+        ):
+            best, best_hits = intent, hits
+    return best
+
+def respond(message):
+    """Return a template reply for trivial messages, or None to fall through to the LLM."""
+    intent = classify(message)
+    with _lock:
+        if intent is None or not intent["replies"]:
+            _stats["miss"] += 1
+            return None
+        _stats["hit"] += 1
+        _stats[f"intent:{intent['name']}"] += 1
+    return random.choice(intent["replies"])
+
+def stats():
+    """Return router hit/miss counts and hit rate."""
+    with _lock:
+        hits, misses = _stats["hit"], _stats["miss"]
+        intents = {key[len("intent:"):]: count for key, count in _stats.items() if key.startswith("intent:")}
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+        "intents": intents,
+    }
@@ -0,0 +1,148 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger()
+
+# Cooldown after a key hits its quota, doubled on each consecutive 429
+COOLDOWN = float(os.getenv("KEY_COOLDOWN", "60"))
+MAX_COOLDOWN = float(os.getenv("KEY_MAX_COOLDOWN", "900"))
+# Window over which recent 429s count against a key when routing
+RATE_LIMIT_WINDOW = 300
+
+class KeyPoolExhausted(Exception):
+    """Raised when every key in a pool is cooling down."""
+
+    def __init__(self, role):
+        super().__init__(f"All {role} API keys are cooling down")
+        self.role = role
+
+class NoKeysConfigured(KeyPoolExhausted):
+    """Raised when a pool has no API keys at all."""
+
+    def __init__(self, role):
+        Exception.__init__(self, f"No {role} API keys are configured")
+        self.role = role
+
+def keys_from_env(name):
+    """Read keys from `<name>S` (comma separated) and `<name>`, without duplicates."""
+    keys = [key.strip() for key in os.getenv(f"{name}S", "").split(",") if key.strip()]
+    single = os.getenv(name)
+    if single and single not in keys:
+        keys.append(single)
+    return keys
+
+def is_pool_error(error):
+    """Return True for errors the pool handles itself (quota and key availability).
+
+    Pass this as a breaker's non-failure filter so one role's quota problems
+    don't open the breaker.
+    """
+    return isinstance(error, KeyPoolExhausted) or is_rate_limited(error)
+
+def is_rate_limited(error):
+    """Return True if an error means the key has hit its quota (HTTP 429)."""
+    return getattr(error, "code", None) == 429 or type(error).__name__ == "ResourceExhausted"
+
+class ApiKey:
+    """A single API key and its usage counters."""
+
+    def __init__(self, value):
+        self.value = value
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.rate_limits = 0
+        self.consecutive_rate_limits = 0
+        self.recent_rate_limits = deque()
+        self.cooldown_until = 0.0
+
+    @property
+    def label(self):
+        return f"...{self.value[-4:]}"
+
+    def recent_429s(self, now):
+        while self.recent_rate_limits and now - self.recent_rate_limits[0] > RATE_LIMIT_WINDOW:
+            self.recent_rate_limits.popleft()
+        return len(self.recent_rate_limits)
+
+class KeyPool:
+    """Spread requests for one model role across several API keys."""
+
+    def __init__(self, role, keys):
+        self.role = role
+        self.keys = [ApiKey(key) for key in keys]
+        self.lock = threading.Lock()
+        if not self.keys:
+            logger.warning("No %s API keys configured.", role)
+
+    def acquire(self):
+        """Pick the available key with the fewest in-flight requests and recent 429s."""
+        now = time.monotonic()
+        with self.lock:
+            available = [key for key in self.keys if key.cooldown_until <= now]
+            if not available:
+                raise KeyPoolExhausted(self.role)
+            key = min(available, key=lambda k: (k.in_flight, k.recent_429s(now), k.requests))
+            key.in_flight += 1
+            key.requests += 1
+            return key
+
+    def release(self, key, error=None):
+        """Return a key to the pool, cooling it down if the call hit its quota."""
+        now = time.monotonic()
+        with self.lock:
+            key.in_flight -= 1
+            if error is None:
+                key.consecutive_rate_limits = 0
+                return
+            key.failures += 1
+            if is_rate_limited(error):
+                key.rate_limits += 1
+                key.recent_rate_limits.append(now)
+                cooldown = min(COOLDOWN * 2 ** key.consecutive_rate_limits, MAX_COOLDOWN)
+                key.consecutive_rate_limits += 1
+                key.cooldown_until = now + cooldown
+                logger.warning("%s API key %s rate limited, cooling down for %.0fs", self.role, key.label, cooldown)
+
+    def run(self, func, *args, **kwargs):
+        """
+        Call `func(api_key, *args, **kwargs)` with a key from the pool.
+
+        A rate-limited call is retried once on each remaining key before the
+        error is raised.
+        """
+        if not self.keys:
+            logger.error("No %s API keys configured.", self.role)
+            raise NoKeysConfigured(self.role)
+
+        for attempt in range(len(self.keys)):
+            key = self.acquire()
+            try:
+                result = func(key.value, *args, **kwargs)
+            except Exception as e:
+                self.release(key, e)
+                if is_rate_limited(e) and attempt < len(self.keys) - 1:
+                    continue
+                raise
+            self.release(key)
+            return result
+
+    def usage(self):
+        """Return per-key usage counters for monitoring."""
+        now = time.monotonic()
+        with self.lock:
+            return [
+                {
+                    "key": key.label,
+                    "in_flight": key.in_flight,
+                    "requests": key.requests,
+                    "failures": key.failures,
+                    "rate_limits": key.rate_limits,
+                    "recent_rate_limits": key.recent_429s(now),
+                    "cooldown_remaining": max(0.0, round(key.cooldown_until - now, 1)),
+                }
+                for key in self.keys
+            ]
@@ -0,0 +1,143 @@
+import os
+import copy
+import json
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+import contextvars
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of high-volume payload logs that are kept
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+# Characters of user message text kept in logs; 0 redacts it entirely
+LOG_PREVIEW_CHARS = int(os.getenv("LOG_PREVIEW_CHARS", "0"))
+
+# Allowlists for the webhook payload lists that carry user content: only these
+# fields are logged, with phone numbers masked. Everything else is dropped.
+ALLOWED_FIELDS = {
+    "messages": {"id", "type", "timestamp"},
+    "contacts": set(),
+    "statuses": {"id", "status", "timestamp", "errors"},
+}
+MASKED_FIELDS = {"from", "wa_id", "to", "recipient_id"}
+
+request_id = contextvars.ContextVar("request_id", default="-")
+
+_listener = None
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request's correlation ID to every record."""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # The base class formats the whole record here, on the request thread, and
+        # discards exc_info. Only merge the args and leave the rest to the listener.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "request_id": getattr(record, "request_id", "-"),
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def setup_logging():
+    """Route all logging through a queue to a background writer thread."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    stream = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s'))
+
+    handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+def sampled(rate=None):
+    """Return True for the fraction of calls that should be logged."""
+    rate = LOG_SAMPLE_RATE if rate is None else rate
+    return rate >= 1 or random.random() < rate
+
+def redact_text(text):
+    """Replace user message text with its length and an optional short preview."""
+    if not isinstance(text, str):
+        return text
+    if LOG_PREVIEW_CHARS and len(text) > LOG_PREVIEW_CHARS:
+        return f"{text[:LOG_PREVIEW_CHARS]}...<{len(text)} chars>"
+    if LOG_PREVIEW_CHARS:
+        return text
+    return f"<redacted {len(text)} chars>"
+
+def mask_id(value):
+    """Keep only the last four characters of a phone number or ID."""
+    value = str(value)
+    return f"***{value[-4:]}" if len(value) > 4 else "***"
+
+def _allowlisted(item, allowed):
+    if not isinstance(item, dict):
+        return "<redacted>"
+    kept = {key: value for key, value in item.items() if key in allowed}
+    for key in MASKED_FIELDS:
+        if key in item:
+            kept[key] = mask_id(item[key])
+    return kept
+
+def redact(payload):
+    """Return a copy of a webhook payload with user content removed and phone numbers masked."""
+    if isinstance(payload, dict):
+        redacted = {}
+        for key, value in payload.items():
+            if key in ALLOWED_FIELDS and isinstance(value, list):
+                redacted[key] = [_allowlisted(item, ALLOWED_FIELDS[key]) for item in value]
+            elif key in MASKED_FIELDS and isinstance(value, (str, int)):
+                redacted[key] = mask_id(value)
+            else:
+                redacted[key] = redact(value)
+        return redacted
+    if isinstance(payload, list):
+        return [redact(item) for item in payload]
+    return payload
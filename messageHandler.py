@@ -1,14 +1,15 @@
 import os
-import google.generativeai as genai
 import importlib
 from dotenv import load_dotenv
 import logging
-import requests
 from io import BytesIO
-from PyPDF2 import PdfReader
-from docx import Document
 import mimetypes
+import threading
 import urllib3
+import resilience
+import keypool
+import fastpath
+import logconfig
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -20,6 +21,30 @@ load_dotenv()
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Heavy dependencies are imported on the first code path that needs them so
+# workers that only ever handle text or status callbacks don't pay for them.
+HEAVY_MODULES = ("google.generativeai", "PyPDF2", "docx", "bs4")
+
+_prewarm_thread = None
+_prewarm_lock = threading.Lock()
+
+def prewarm():
+    """Import heavy dependencies once, in a background thread."""
+    global _prewarm_thread
+    def _warm():
+        for name in HEAVY_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                logger.warning("Pre-warm skipped %s: %s", name, e)
+        logger.info("Pre-warmed heavy dependencies.")
+
+    with _prewarm_lock:
+        if _prewarm_thread is None:
+            _prewarm_thread = threading.Thread(target=_warm, name="prewarm", daemon=True)
+            _prewarm_thread.start()
+    return _prewarm_thread
+
 # System instruction for text conversations
 system_instruction = """
 *System Name:* Your Name is KORA AI, an AI Assistant created by Kolawole Suleiman. 
@@ -28,13 +53,39 @@ You should assist with all topics.
 ...
 """
 
+# Gemini read timeout in seconds
+GEMINI_TIMEOUT = resilience.timeout_for("gemini_text")[1]
+
+# Gemini API key pools, one per model role. Set GEMINI_TEXT_API_KEYS /
+# GEMINI_IMAGE_API_KEYS to a comma separated list to spread load across keys.
+TEXT_KEYS = keypool.KeyPool("text", keypool.keys_from_env("GEMINI_TEXT_API_KEY"))
+IMAGE_KEYS = keypool.KeyPool("image", keypool.keys_from_env("GEMINI_IMAGE_API_KEY"))
+
+OVERLOADED_MESSAGE = "😔 I'm a bit overloaded right now. Please try again in a minute."
+
 # Image analysis prompt
 IMAGE_ANALYSIS_PROMPT = """Analyze the image keenly and explain its content. If it's text, translate it and identify the language."""
 
-def initialize_text_model():
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_key):
+    """Return a Gemini client bound to one API key.
+
+    `genai.configure` sets a single process-wide key, so each pooled key gets
+    its own client instead.
+    """
+    with _clients_lock:
+        if api_key not in _clients:
+            from google.ai import generativelanguage as glm
+            from google.api_core.client_options import ClientOptions
+            _clients[api_key] = glm.GenerativeServiceClient(client_options=ClientOptions(api_key=api_key))
+        return _clients[api_key]
+
+def initialize_text_model(api_key):
     """Initialize Gemini model for text processing."""
-    genai.configure(api_key=os.getenv("GEMINI_TEXT_API_KEY"))
-    return genai.GenerativeModel(
+    import google.generativeai as genai
+    model = genai.GenerativeModel(
         model_name="gemini-1.5-flash",
         generation_config={
             "temperature": 0.3,
@@ -43,20 +94,46 @@ def initialize_text_model():
             "max_output_tokens": 8192,
         }
     )
+    model._client = get_client(api_key)
+    return model
 
-def initialize_image_model():
+def initialize_image_model(api_key):
     """Initialize Gemini model for image processing."""
-    genai.configure(api_key=os.getenv("GEMINI_IMAGE_API_KEY"))
-    return genai.GenerativeModel("gemini-1.5-pro")
+    import google.generativeai as genai
+    model = genai.GenerativeModel("gemini-1.5-pro")
+    model._client = get_client(api_key)
+    return model
+
+def _send_text(api_key, user_message):
+    chat = initialize_text_model(api_key).start_chat(history=[])
+    return chat.send_message(
+        f"{system_instruction}\n\nHuman: {user_message}",
+        request_options={"timeout": GEMINI_TIMEOUT},
+    )
+
+def _analyze_image(api_key, image_data):
+    return initialize_image_model(api_key).generate_content([
+        IMAGE_ANALYSIS_PROMPT,
+        {'mime_type': 'image/jpeg', 'data': image_data}
+    ], request_options={"timeout": GEMINI_TIMEOUT})
 
 def handle_text_message(user_message,recent_message):
     """Handle incoming text messages."""
     try:
-        logger.info("Processing text message: %s", user_message)
-        chat = initialize_text_model().start_chat(history=[])
-        response = chat.send_message(f"{system_instruction}\n\nHuman: {user_message}")
+        logger.info("Processing text message: %s", logconfig.redact_text(user_message))
+
+        # Answer greetings, thanks, emoji and the like locally without the LLM
+        quick_reply = fastpath.respond(user_message)
+        if quick_reply:
+            return quick_reply
+
+        response = resilience.call("gemini_text", TEXT_KEYS.run, _send_text, user_message,
+                                   is_failure=lambda e: not keypool.is_pool_error(e))
         return response.text
     except Exception as e:
+        # Open breaker, or every key exhausted (including the SDK's ResourceExhausted from the last key)
+        if isinstance(e, resilience.CircuitOpenError) or keypool.is_pool_error(e):
+            return OVERLOADED_MESSAGE
         logger.error("Error processing text message: %s", str(e))
         return "😔 Sorry, I encountered an error processing your message."
 
@@ -80,27 +157,26 @@ def handle_attachment(media_url,message_type=None,file_extension=None):
             api_key = os.getenv('IMGE_API_KEY')
             files = {"source": ("attachment.jpg", media_url, "image/jpeg")}
             headers = {"X-API-Key": api_key}
-            upload_response = requests.post(upload_url, files=files, headers=headers, verify=False)
+            upload_response = resilience.request("imge", "post", upload_url, files=files, headers=headers, verify=False)
             upload_response.raise_for_status()
             image_url = upload_response.json()['image']['url']
             logger.info(f"Image uploaded successfully: {image_url}")
 
             # Download image for Gemini processing
-            image_response = requests.get(image_url, verify=False)
+            image_response = resilience.request("imge", "get", image_url, hedge=True, verify=False)
             image_response.raise_for_status()
             image_data = BytesIO(image_response.content).getvalue()
 
             # Analyze the image
-            model = initialize_image_model()
-            response = model.generate_content([
-                IMAGE_ANALYSIS_PROMPT,
-                {'mime_type': 'image/jpeg', 'data': image_data}
-            ])
+            response = resilience.call("gemini_image", IMAGE_KEYS.run, _analyze_image, image_data,
+                                       is_failure=lambda e: not keypool.is_pool_error(e))
             return f"""🖼️ Image Analysis:
 {response.text}
 
 🔗 View Image: {image_url}"""
         except Exception as e:
+            if isinstance(e, resilience.CircuitOpenError) or keypool.is_pool_error(e):
+                return "⏳ Image analysis is temporarily unavailable. Please try again in a minute."
             logger.error(f"Error processing image attachment: {str(e)}")
             return "🚨 Error analyzing the image. Please try again later."
 
@@ -108,11 +184,13 @@ def handle_attachment(media_url,message_type=None,file_extension=None):
         try:
             # Handle different file types
             if file_extension in ["pdf"]:
+                from PyPDF2 import PdfReader
                 reader = PdfReader(BytesIO(attachment_data))
                 text = "\n".join(page.extract_text() for page in reader.pages)
                 return f"📄 PDF Content:\n{text[:1000]}...\n\n(Truncated to 1000 characters)"
 
             elif file_extension in ["docx"]:
+                from docx import Document
                 document = Document(BytesIO(attachment_data))
                 text = "\n".join(paragraph.text for paragraph in document.paragraphs)
                 return f"📄 DOCX Content:\n{text[:1000]}...\n\n(Truncated to 1000 characters)"
@@ -0,0 +1,166 @@
+import os
+import time
+import logging
+import threading
+from collections import deque, Counter
+
+logger = logging.getLogger()
+
+LATENCY_WINDOW = 1000
+# Shortest window CPU usage is measured over; reads in between reuse the last value
+CPU_MIN_INTERVAL = 1.0
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+_lock = threading.Lock()
+_message_times = deque()
+_latencies = deque(maxlen=LATENCY_WINDOW)
+_counters = Counter()
+_providers = {}
+_files = {}
+_last_cpu_sample = None
+_last_cpu_percent = None
+
+def _read_proc(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _process_start_time():
+    """Return the wall-clock time this process started, from /proc when available."""
+    stat = _read_proc("/proc/self/stat")
+    uptime = _read_proc("/proc/uptime")
+    if stat and uptime:
+        # Fields after the command name; starttime is field 22 of the full line
+        fields = stat.rsplit(")", 1)[1].split()
+        started_after_boot = int(fields[19]) / CLOCK_TICKS
+        return time.time() - float(uptime.split()[0]) + started_after_boot
+    return time.time()
+
+START_TIME = _process_start_time()
+
+def _cpu_seconds():
+    stat = _read_proc("/proc/self/stat")
+    if stat:
+        fields = stat.rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    return time.process_time()
+
+def uptime_seconds():
+    return time.time() - START_TIME
+
+def cpu_percent():
+    """Return process CPU usage over the last window of at least CPU_MIN_INTERVAL seconds."""
+    global _last_cpu_sample, _last_cpu_percent
+    now, cpu = time.time(), _cpu_seconds()
+    with _lock:
+        last_time, last_cpu = _last_cpu_sample or (START_TIME, 0.0)
+        elapsed = now - last_time
+        if elapsed < CPU_MIN_INTERVAL and _last_cpu_percent is not None:
+            return _last_cpu_percent
+        if elapsed <= 0:
+            return 0.0
+        percent = 100 * (cpu - last_cpu) / elapsed
+        _last_cpu_percent = round(min(max(percent, 0.0), 100.0 * (os.cpu_count() or 1)), 1)
+        _last_cpu_sample = (now, cpu)
+        return _last_cpu_percent
+
+def _meminfo_kb(text, field):
+    for line in text.splitlines():
+        if line.startswith(field + ":"):
+            return int(line.split()[1])
+    return None
+
+def memory_usage():
+    """Return (rss_bytes, percent_of_total) from /proc, or (None, None) if unavailable."""
+    status = _read_proc("/proc/self/status")
+    meminfo = _read_proc("/proc/meminfo")
+    rss_kb = _meminfo_kb(status, "VmRSS") if status else None
+    total_kb = _meminfo_kb(meminfo, "MemTotal") if meminfo else None
+    if rss_kb is None:
+        return None, None
+    percent = round(100 * rss_kb / total_kb, 1) if total_kb else None
+    return rss_kb * 1024, percent
+
+def record_message(latency=None):
+    """Record one handled message and, optionally, its reply latency in seconds."""
+    now = time.time()
+    with _lock:
+        _message_times.append(now)
+        while _message_times and now - _message_times[0] > 60:
+            _message_times.popleft()
+        if latency is not None:
+            _latencies.append(latency)
+        _counters["messages"] += 1
+
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+def get_counter(name):
+    with _lock:
+        return _counters[name]
+
+def hit_rate(name):
+    """Return the hit rate for a `<name>_hit` / `<name>_miss` counter pair."""
+    with _lock:
+        hits, misses = _counters[f"{name}_hit"], _counters[f"{name}_miss"]
+    return round(hits / (hits + misses), 4) if hits + misses else 0.0
+
+def register(name, provider):
+    """Register a callable whose result is included in snapshots (e.g. queue depths)."""
+    _providers[name] = provider
+
+def register_file(name, path):
+    """Report the on-disk size of a file, including SQLite WAL/journal files."""
+    _files[name] = path
+
+def messages_per_minute():
+    now = time.time()
+    with _lock:
+        return sum(1 for t in _message_times if now - t <= 60)
+
+def latency_percentiles():
+    """Return p50/p99 reply latency in milliseconds over the recent window."""
+    with _lock:
+        ordered = sorted(_latencies)
+    if not ordered:
+        return {"p50_ms": None, "p99_ms": None}
+    pick = lambda q: round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * q))], 1)
+    return {"p50_ms": pick(0.50), "p99_ms": pick(0.99)}
+
+def file_sizes():
+    sizes = {}
+    for name, path in _files.items():
+        total = 0
+        for suffix in ("", "-wal", "-journal"):
+            try:
+                total += os.path.getsize(path + suffix)
+            except OSError:
+                pass
+        sizes[name] = total
+    return sizes
+
+def snapshot():
+    """Return all runtime stats as a JSON-serializable dict."""
+    rss, memory_percent = memory_usage()
+    with _lock:
+        counters = dict(_counters)
+    data = {
+        "uptime_seconds": round(uptime_seconds(), 1),
+        "cpu_percent": cpu_percent(),
+        "rss_bytes": rss,
+        "memory_percent": memory_percent,
+        "messages_per_minute": messages_per_minute(),
+        "latency": latency_percentiles(),
+        "counters": counters,
+        "file_sizes": file_sizes(),
+    }
+    for name, provider in list(_providers.items()):
+        try:
+            data[name] = provider()
+        except Exception as e:
+            logger.warning("Stats provider %s failed: %s", name, str(e))
+            data[name] = None
+    return data
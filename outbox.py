@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger()
+
+# Sender loop settings
+SEND_RATE = float(os.getenv("OUTBOX_RATE", "20"))  # messages per second
+BATCH_SIZE = 50
+POLL_INTERVAL = 1.0
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+BASE_BACKOFF = 2.0
+MAX_BACKOFF = 300.0
+# Rows stuck in 'sending' longer than this (e.g. after a crash) are retried
+CLAIM_TIMEOUT = 120.0
+# Failed rows are kept this long for inspection, then deleted
+FAILED_RETENTION = float(os.getenv("OUTBOX_FAILED_RETENTION", str(7 * 24 * 3600)))
+
+PENDING = "pending"
+SENDING = "sending"
+FAILED = "failed"
+
+class Deferred(Exception):
+    """Raised by a deliver callable when nothing was sent and the row should wait.
+
+    Deferred rows are rescheduled without using up one of MAX_ATTEMPTS.
+    """
+
+    def __init__(self, delay, reason=""):
+        super().__init__(reason)
+        self.delay = delay
+
+_db_path = None
+_wake = threading.Event()
+_thread = None
+_start_lock = threading.Lock()
+_counters = {"sent": 0, "retries": 0, "failed": 0, "deferred": 0}
+_counters_lock = threading.Lock()
+
+def init(db_path):
+    """Create the outbox table if it doesn't exist."""
+    global _db_path
+    _db_path = db_path
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipient_id TEXT,
+                payload TEXT,
+                status TEXT DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at REAL,
+                claimed_at REAL,
+                created_at REAL,
+                last_error TEXT
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, recipient_id, id)")
+        conn.commit()
+
+def enqueue(recipient_id, payload):
+    """Store an outbound payload; the sender loop delivers it."""
+    now = time.time()
+    with sqlite3.connect(_db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO outbox (recipient_id, payload, status, next_attempt_at, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (recipient_id, json.dumps(payload), PENDING, now, now))
+        conn.commit()
+    _wake.set()
+
+def _recover(conn):
+    """Put rows abandoned mid-send back in the queue."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE outbox SET status = ?, claimed_at = NULL
+        WHERE status = ? AND claimed_at < ?
+    """, (PENDING, SENDING, time.time() - CLAIM_TIMEOUT))
+    conn.commit()
+    if cursor.rowcount:
+        logger.info("Recovered %d unsent outbox messages.", cursor.rowcount)
+
+def _next_batch(conn):
+    """Return due rows, at most one per recipient and only its oldest unsent one."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, recipient_id, payload, attempts FROM outbox o
+        WHERE status = ? AND next_attempt_at <= ?
+          AND id = (SELECT MIN(id) FROM outbox
+                    WHERE recipient_id = o.recipient_id AND status IN (?, ?))
+        ORDER BY id LIMIT ?
+    """, (PENDING, time.time(), PENDING, SENDING, BATCH_SIZE))
+    return cursor.fetchall()
+
+def _claim(conn, row_id):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE outbox SET status = ?, claimed_at = ? WHERE id = ? AND status = ?",
+                   (SENDING, time.time(), row_id, PENDING))
+    conn.commit()
+    return cursor.rowcount == 1
+
+def _finish(conn, row_id, attempts, ok, retryable, error):
+    cursor = conn.cursor()
+    if ok:
+        cursor.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+        counter = "sent"
+    elif retryable and attempts < MAX_ATTEMPTS:
+        delay = min(BASE_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+        cursor.execute("""
+            UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, claimed_at = NULL, last_error = ?
+            WHERE id = ?
+        """, (PENDING, attempts, time.time() + delay, error, row_id))
+        counter = "retries"
+    else:
+        cursor.execute("UPDATE outbox SET status = ?, attempts = ?, last_error = ? WHERE id = ?",
+                       (FAILED, attempts, error, row_id))
+        logger.error("Dropping outbox message %d after %d attempts: %s", row_id, attempts, error)
+        counter = "failed"
+    conn.commit()
+    with _counters_lock:
+        _counters[counter] += 1
+
+def _defer(conn, row_id, delay, reason):
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE outbox SET status = ?, next_attempt_at = ?, claimed_at = NULL, last_error = ?
+        WHERE id = ?
+    """, (PENDING, time.time() + max(delay, POLL_INTERVAL), reason, row_id))
+    conn.commit()
+    with _counters_lock:
+        _counters["deferred"] += 1
+
+def _send_batch(conn, deliver, interval=0.0):
+    """Deliver one batch of due rows and return it (empty when nothing was due)."""
+    _recover(conn)
+    batch = _next_batch(conn)
+    for row_id, recipient_id, payload, attempts in batch:
+        if not _claim(conn, row_id):
+            continue
+        try:
+            ok, retryable, error = deliver(json.loads(payload))
+        except Deferred as e:
+            _defer(conn, row_id, e.delay, str(e))
+            continue
+        except Exception as e:
+            ok, retryable, error = False, True, str(e)
+        _finish(conn, row_id, attempts + 1, ok, retryable, error)
+        time.sleep(interval)
+    return batch
+
+def _run(deliver):
+    interval = 1.0 / SEND_RATE
+    while True:
+        try:
+            with sqlite3.connect(_db_path) as conn:
+                batch = _send_batch(conn, deliver, interval)
+        except sqlite3.Error as e:
+            logger.error("Outbox sender error: %s", str(e))
+            batch = []
+
+        if not batch:
+            _wake.wait(POLL_INTERVAL)
+            _wake.clear()
+
+def start(db_path, deliver):
+    """
+    Start the background sender loop.
+
+    Args:
+        db_path (str): SQLite database holding the outbox table.
+        deliver (callable): Sends one payload and returns (ok, retryable, error),
+            or raises Deferred if it didn't try to send.
+    """
+    global _thread
+    with _start_lock:
+        if _thread is None:
+            init(db_path)
+            _thread = threading.Thread(target=_run, args=(deliver,), name="outbox", daemon=True)
+            _thread.start()
+    return _thread
+
+def cleanup_failed(max_age=FAILED_RETENTION):
+    """Delete failed rows older than max_age seconds."""
+    with sqlite3.connect(_db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM outbox WHERE status = ? AND created_at < ?",
+                       (FAILED, time.time() - max_age))
+        conn.commit()
+
+def stats():
+    """Return queue depth, lag and delivery counters."""
+    with sqlite3.connect(_db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT status, COUNT(*), MIN(created_at), MAX(attempts) FROM outbox GROUP BY status
+        """)
+        rows = {status: (count, oldest, attempts) for status, count, oldest, attempts in cursor.fetchall()}
+
+    unsent = [rows[status] for status in (PENDING, SENDING) if status in rows]
+    oldest = min((row[1] for row in unsent), default=None)
+    with _counters_lock:
+        counters = dict(_counters)
+    return {
+        "pending": sum(row[0] for row in unsent),
+        "failed": rows.get(FAILED, (0,))[0],
+        "lag_seconds": round(time.time() - oldest, 1) if oldest else 0.0,
+        "max_attempts": max((row[2] for row in unsent), default=0),
+        **counters,
+    }
@@ -0,0 +1,255 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+logger = logging.getLogger()
+
+# Per-upstream timeouts in seconds (connect, read)
+UPSTREAMS = {
+    "graph": (5, 15),
+    "gemini_text": (5, 60),
+    "gemini_image": (5, 60),
+    "imge": (5, 30),
+    "smfahim": (5, 90),
+    "skysports": (3, 10),
+    "newsapi": (3, 10),
+    "quotes": (3, 10),
+    "smtp": (10, 10),
+}
+DEFAULT_TIMEOUT = (5, 30)
+
+FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+# Hedged requests wait for the upstream's p95 latency before firing a second copy
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WORKERS = 16
+# Once a hedge is armed the primary gives up reading after this many p95s,
+# leaving the hedge copy (which keeps the full timeout) to finish the call
+HEDGE_PRIMARY_FACTOR = 3
+LATENCY_WINDOW = 200
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FALLBACK_MESSAGE = "⏳ This service is temporarily unavailable. Please try again in a minute."
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the upstream's breaker is open."""
+
+    def __init__(self, upstream, retry_after=0.0):
+        super().__init__(f"Circuit breaker for {upstream} is open")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker for a single upstream."""
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go through, moving open -> half-open after the reset timeout."""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def retry_after(self):
+        """Return seconds until an open breaker lets a trial call through."""
+        with self.lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def record_success(self, latency=None):
+        with self.lock:
+            if latency is not None:
+                self.latencies.append(latency)
+            self.state = CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def release(self):
+        """Finish a call that says nothing about the upstream's health."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.trips += 1
+                    logger.warning("Circuit breaker for %s opened.", self.name)
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def p95(self):
+        """Return the p95 latency in seconds, or None without enough samples."""
+        with self.lock:
+            if len(self.latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "trips": self.trips,
+                "samples": len(self.latencies),
+            }
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+# One slot per hedge worker, so a hedge copy never waits in the executor queue
+_hedge_slots = threading.BoundedSemaphore(HEDGE_WORKERS)
+
+def get_breaker(upstream):
+    """Return the shared circuit breaker for an upstream."""
+    with _breakers_lock:
+        if upstream not in _breakers:
+            _breakers[upstream] = CircuitBreaker(upstream)
+        return _breakers[upstream]
+
+def timeout_for(upstream):
+    """Return the (connect, read) timeout for an upstream."""
+    return UPSTREAMS.get(upstream, DEFAULT_TIMEOUT)
+
+def breaker_states():
+    """Return the state and trip count of every breaker, for monitoring."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+def _is_failure(response):
+    return response.status_code == 429 or response.status_code >= 500
+
+def _timed_request(method, url, kwargs):
+    start = time.monotonic()
+    response = requests.request(method, url, **kwargs)
+    return response, time.monotonic() - start
+
+def _hedged_request(breaker, method, url, kwargs):
+    """
+    Run the request on the caller's thread and fire one copy on the hedge pool
+    if it is still running after the upstream's p95 latency.
+
+    Hedging is skipped until there are enough latency samples, or when every
+    hedge worker is busy.
+    """
+    delay = breaker.p95()
+    if delay is None or not _hedge_slots.acquire(blocking=False):
+        return _timed_request(method, url, kwargs)
+
+    primary_done = threading.Event()
+    hedge_started = threading.Event()
+
+    def hedge():
+        try:
+            if primary_done.wait(delay):
+                return None
+            hedge_started.set()
+            logger.info("Hedging slow %s request after %.2fs", breaker.name, delay)
+            return _timed_request(method, url, kwargs)
+        finally:
+            _hedge_slots.release()
+
+    future = _hedge_executor.submit(hedge)
+    timeout = kwargs["timeout"]
+    connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    primary_kwargs = dict(kwargs, timeout=(connect, min(read, HEDGE_PRIMARY_FACTOR * delay)))
+    try:
+        result = _timed_request(method, url, primary_kwargs)
+    except requests.RequestException:
+        primary_done.set()
+        if not hedge_started.is_set():
+            raise
+        return future.result()
+    primary_done.set()
+    return result
+
+def request(upstream, method, url, hedge=False, **kwargs):
+    """
+    Send an HTTP request to an upstream through its timeout and circuit breaker.
+
+    Args:
+        upstream (str): Name of the upstream, used to pick the timeout and breaker.
+        method (str): HTTP method.
+        url (str): Request URL.
+        hedge (bool): Fire a second copy after the upstream's p95 latency.
+            Only use this for idempotent reads.
+
+    Returns:
+        requests.Response: The upstream response.
+
+    Raises:
+        CircuitOpenError: If the upstream's breaker is open.
+        requests.RequestException: If the request itself fails.
+    """
+    breaker = get_breaker(upstream)
+    if not breaker.allow():
+        raise CircuitOpenError(upstream, breaker.retry_after())
+
+    kwargs.setdefault("timeout", timeout_for(upstream))
+    try:
+        if hedge:
+            response, latency = _hedged_request(breaker, method, url, kwargs)
+        else:
+            response, latency = _timed_request(method, url, kwargs)
+    except requests.RequestException:
+        breaker.record_failure()
+        raise
+
+    if _is_failure(response):
+        breaker.record_failure()
+    else:
+        breaker.record_success(latency)
+    return response
+
+def call(upstream, func, *args, is_failure=None, **kwargs):
+    """
+    Call a non-HTTP upstream (e.g. an SDK) through its circuit breaker.
+
+    `is_failure(error)` decides which exceptions count against the breaker;
+    by default every exception does.
+    """
+    breaker = get_breaker(upstream)
+    if not breaker.allow():
+        raise CircuitOpenError(upstream, breaker.retry_after())
+
+    start = time.monotonic()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        if is_failure is None or is_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.release()
+        raise
+    breaker.record_success(time.monotonic() - start)
+    return result
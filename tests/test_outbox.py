@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import unittest
+
+import outbox
+
+
+class OutboxTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        outbox.init(self.db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        self.sent = []
+
+    def tearDown(self):
+        self.conn.close()
+        os.remove(self.db_path)
+
+    def deliver(self, payload):
+        self.sent.append(payload["text"])
+        return True, False, None
+
+    def rows(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT payload, status, attempts, next_attempt_at FROM outbox ORDER BY id")
+        return [(json.loads(payload)["text"], status, attempts, due) for payload, status, attempts, due in cursor.fetchall()]
+
+    def test_delivers_in_order_one_per_recipient_per_batch(self):
+        outbox.enqueue("a", {"text": "a1"})
+        outbox.enqueue("a", {"text": "a2"})
+        outbox.enqueue("b", {"text": "b1"})
+
+        outbox._send_batch(self.conn, self.deliver)
+        self.assertEqual(self.sent, ["a1", "b1"])
+        outbox._send_batch(self.conn, self.deliver)
+        self.assertEqual(self.sent, ["a1", "b1", "a2"])
+        self.assertEqual(self.rows(), [])
+
+    def test_retryable_failure_backs_off_and_blocks_later_messages(self):
+        outbox.enqueue("a", {"text": "a1"})
+        outbox.enqueue("a", {"text": "a2"})
+
+        outbox._send_batch(self.conn, lambda payload: (False, True, "HTTP 503"))
+        (text, status, attempts, due), _ = self.rows()
+        self.assertEqual((text, status, attempts), ("a1", outbox.PENDING, 1))
+        self.assertGreater(due, time.time())
+
+        self.assertEqual(outbox._send_batch(self.conn, self.deliver), [])
+        self.assertEqual(self.sent, [])
+
+    def test_exceptions_are_retried(self):
+        outbox.enqueue("a", {"text": "a1"})
+
+        def broken(payload):
+            raise ValueError("boom")
+
+        outbox._send_batch(self.conn, broken)
+        self.assertEqual(self.rows()[0][1:3], (outbox.PENDING, 1))
+
+    def test_non_retryable_failure_is_marked_failed_and_unblocks_recipient(self):
+        outbox.enqueue("a", {"text": "a1"})
+        outbox.enqueue("a", {"text": "a2"})
+
+        outbox._send_batch(self.conn, lambda payload: (False, False, "HTTP 400"))
+        outbox._send_batch(self.conn, self.deliver)
+        self.assertEqual(self.sent, ["a2"])
+        self.assertEqual([row[:3] for row in self.rows()], [("a1", outbox.FAILED, 1)])
+
+    def test_gives_up_after_max_attempts(self):
+        outbox.enqueue("a", {"text": "a1"})
+        self.conn.execute("UPDATE outbox SET attempts = ?", (outbox.MAX_ATTEMPTS - 1,))
+        self.conn.commit()
+
+        outbox._send_batch(self.conn, lambda payload: (False, True, "HTTP 503"))
+        self.assertEqual(self.rows()[0][1:3], (outbox.FAILED, outbox.MAX_ATTEMPTS))
+
+    def test_deferred_rows_wait_without_using_an_attempt(self):
+        outbox.enqueue("a", {"text": "a1"})
+
+        def deferred(payload):
+            raise outbox.Deferred(30, "breaker open")
+
+        outbox._send_batch(self.conn, deferred)
+        text, status, attempts, due = self.rows()[0]
+        self.assertEqual((status, attempts), (outbox.PENDING, 0))
+        self.assertGreater(due, time.time() + 20)
+
+    def test_recovers_rows_abandoned_mid_send(self):
+        outbox.enqueue("a", {"text": "a1"})
+        self.conn.execute("UPDATE outbox SET status = ?, claimed_at = ?",
+                          (outbox.SENDING, time.time() - outbox.CLAIM_TIMEOUT - 1))
+        self.conn.commit()
+
+        outbox._send_batch(self.conn, self.deliver)
+        self.assertEqual(self.sent, ["a1"])
+
+    def test_recent_claims_are_not_recovered(self):
+        outbox.enqueue("a", {"text": "a1"})
+        outbox._claim(self.conn, 1)
+
+        outbox._send_batch(self.conn, self.deliver)
+        self.assertEqual(self.sent, [])
+
+    def test_cleanup_deletes_only_old_failed_rows(self):
+        outbox.enqueue("a", {"text": "old"})
+        outbox.enqueue("b", {"text": "new"})
+        outbox.enqueue("c", {"text": "pending"})
+        self.conn.execute("UPDATE outbox SET status = ? WHERE recipient_id IN ('a', 'b')", (outbox.FAILED,))
+        self.conn.execute("UPDATE outbox SET created_at = 0 WHERE recipient_id IN ('a', 'c')")
+        self.conn.commit()
+
+        outbox.cleanup_failed(max_age=60)
+        self.assertEqual([row[0] for row in self.rows()], ["new", "pending"])
+
+
+if __name__ == "__main__":
+    unittest.main()
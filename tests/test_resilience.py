@@ -0,0 +1,164 @@
+import time
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import resilience
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers 200 after `delay` seconds; the first `slow_requests` requests take `slow_delay`."""
+
+    delay = 0.0
+    slow_delay = 0.0
+    slow_requests = 0
+    status = 200
+    hits = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with StubHandler.lock:
+            StubHandler.hits += 1
+            slow = StubHandler.slow_requests > 0
+            if slow:
+                StubHandler.slow_requests -= 1
+        time.sleep(StubHandler.slow_delay if slow else StubHandler.delay)
+        try:
+            self.send_response(StubHandler.status)
+            self.end_headers()
+            self.wfile.write(b"ok")
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_after_threshold_and_rejects(self):
+        breaker = resilience.CircuitBreaker("t", failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, resilience.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, resilience.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.trips, 1)
+        self.assertGreater(breaker.retry_after(), 0)
+
+    def test_half_open_allows_one_trial(self):
+        breaker = resilience.CircuitBreaker("t", failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, resilience.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_half_open_success_closes(self):
+        breaker = resilience.CircuitBreaker("t", failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        breaker.allow()
+        breaker.record_success(0.1)
+        self.assertEqual(breaker.state, resilience.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_half_open_failure_reopens(self):
+        breaker = resilience.CircuitBreaker("t", failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        breaker.allow()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, resilience.OPEN)
+        self.assertEqual(breaker.trips, 2)
+
+    def test_p95_needs_enough_samples(self):
+        breaker = resilience.CircuitBreaker("t")
+        for _ in range(resilience.HEDGE_MIN_SAMPLES - 1):
+            breaker.record_success(0.1)
+        self.assertIsNone(breaker.p95())
+        breaker.record_success(0.1)
+        self.assertAlmostEqual(breaker.p95(), 0.1)
+
+
+class CallTest(unittest.TestCase):
+    def setUp(self):
+        resilience._breakers.clear()
+
+    def fail(self):
+        raise ValueError("bad input")
+
+    def test_failures_open_breaker(self):
+        for _ in range(resilience.FAILURE_THRESHOLD):
+            with self.assertRaises(ValueError):
+                resilience.call("c", self.fail)
+        with self.assertRaises(resilience.CircuitOpenError) as ctx:
+            resilience.call("c", self.fail)
+        self.assertGreater(ctx.exception.retry_after, 0)
+
+    def test_is_failure_filter_keeps_breaker_closed(self):
+        for _ in range(resilience.FAILURE_THRESHOLD + 1):
+            with self.assertRaises(ValueError):
+                resilience.call("c", self.fail, is_failure=lambda e: False)
+        self.assertEqual(resilience.get_breaker("c").state, resilience.CLOSED)
+
+
+class RequestTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        resilience._breakers.clear()
+        StubHandler.delay = 0.0
+        StubHandler.slow_delay = 0.0
+        StubHandler.slow_requests = 0
+        StubHandler.status = 200
+        StubHandler.hits = 0
+
+    def test_server_errors_count_as_failures(self):
+        StubHandler.status = 503
+        for _ in range(resilience.FAILURE_THRESHOLD):
+            resilience.request("stub", "get", self.url)
+        with self.assertRaises(resilience.CircuitOpenError):
+            resilience.request("stub", "get", self.url)
+        self.assertEqual(StubHandler.hits, resilience.FAILURE_THRESHOLD)
+
+    def test_timeouts_count_as_failures(self):
+        StubHandler.delay = 0.2
+        with self.assertRaises(requests.RequestException):
+            resilience.request("stub", "get", self.url, timeout=(1, 0.05))
+        self.assertEqual(resilience.get_breaker("stub").failures, 1)
+
+    def test_no_hedge_without_latency_samples(self):
+        StubHandler.delay = 0.05
+        resilience.request("stub", "get", self.url, hedge=True)
+        time.sleep(0.1)
+        self.assertEqual(StubHandler.hits, 1)
+
+    def test_hedge_returns_before_stalled_primary(self):
+        StubHandler.delay = 0.02
+        for _ in range(resilience.HEDGE_MIN_SAMPLES):
+            resilience.request("stub", "get", self.url)
+
+        StubHandler.slow_delay = 2.0
+        StubHandler.slow_requests = 1
+        start = time.monotonic()
+        response = resilience.request("stub", "get", self.url, hedge=True)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(StubHandler.hits, resilience.HEDGE_MIN_SAMPLES + 2)
+
+
+if __name__ == "__main__":
+    unittest.main()